@@ -3,22 +3,170 @@
 Script para converter todo o código fonte de um repositório para um arquivo Markdown único.
 
 Uso:
-    python repo_to_md.py <diretorio> -o <arquivo_saida.md> [-x <regex_pattern>]
+    python repo_to_md.py <diretorio> -o <arquivo_saida.md> [-x <regex_pattern>] [-s <max_bytes>]
 
 Exemplos:
     python repo_to_md.py ./meu_projeto -o codigo_completo.md
     python repo_to_md.py ./meu_projeto -o codigo_completo.md -x "test_.*\.py|.*\.pyc"
 """
 
+import io
 import os
 import re
+import shutil
 import argparse
-from pathlib import Path
-from typing import List, Set
+import tempfile
+import types
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator, List, Optional, Set, Tuple
+
+# Extensões de código suportadas
+CODE_EXTENSIONS = {
+    '.py': 'python',
+    '.js': 'javascript',
+    '.ts': 'typescript',
+    '.jsx': 'jsx',
+    '.tsx': 'tsx',
+    '.java': 'java',
+    '.c': 'c',
+    '.cpp': 'cpp',
+    '.cc': 'cpp',
+    '.cxx': 'cpp',
+    '.h': 'c',
+    '.hpp': 'cpp',
+    '.cs': 'csharp',
+    '.php': 'php',
+    '.rb': 'ruby',
+    '.go': 'go',
+    '.rs': 'rust',
+    '.swift': 'swift',
+    '.kt': 'kotlin',
+    '.scala': 'scala',
+    '.sh': 'bash',
+    '.bash': 'bash',
+    '.zsh': 'zsh',
+    '.fish': 'fish',
+    '.ps1': 'powershell',
+    '.html': 'html',
+    '.htm': 'html',
+    '.css': 'css',
+    '.scss': 'scss',
+    '.sass': 'sass',
+    '.less': 'less',
+    '.xml': 'xml',
+    '.json': 'json',
+    '.yaml': 'yaml',
+    '.yml': 'yaml',
+    '.toml': 'toml',
+    '.ini': 'ini',
+    '.cfg': 'ini',
+    '.conf': 'ini',
+    '.sql': 'sql',
+    '.r': 'r',
+    '.R': 'r',
+    '.m': 'matlab',
+    '.pl': 'perl',
+    '.lua': 'lua',
+    '.vim': 'vim',
+    '.dockerfile': 'dockerfile',
+    '.Dockerfile': 'dockerfile',
+    '.md': 'markdown',
+    '.markdown': 'markdown',
+    '.tex': 'latex',
+    '.vue': 'vue',
+    '.svelte': 'svelte',
+    '.dart': 'dart',
+    '.elm': 'elm',
+    '.ex': 'elixir',
+    '.exs': 'elixir',
+    '.erl': 'erlang',
+    '.hrl': 'erlang',
+    '.clj': 'clojure',
+    '.cljs': 'clojure',
+    '.hs': 'haskell',
+    '.lhs': 'haskell',
+    '.ml': 'ocaml',
+    '.mli': 'ocaml',
+    '.fs': 'fsharp',
+    '.fsx': 'fsharp',
+    '.jl': 'julia',
+    '.nim': 'nim',
+    '.nims': 'nim',
+    '.cr': 'crystal',
+    '.zig': 'zig',
+    '.v': 'v',
+    '.sv': 'systemverilog',
+    '.vhd': 'vhdl',
+    '.vhdl': 'vhdl'
+}
+
+# Conjunto congelado para os testes de pertinência
+_CODE_EXTS = frozenset(CODE_EXTENSIONS)
+
+# Tabela de substituição das âncoras do índice (uma única passada com str.translate)
+_ANCHOR_TABLE = str.maketrans({'/': '-', '.': '-', '_': '-'})
+
+# Padrões de diretório seguros para poda, ex: "node_modules/.*", "\.egg-info/.*", "venv"
+_DIR_PATTERN_RE = re.compile(r'(?:\\[^\w\s/]|[\w-])+(?:/\.\*)?')
+
+def _split_alternatives(pattern: str) -> List[str]:
+    """Divide um padrão nas alternativas de nível superior: "a|(b|c)" -> ["a", "(b|c)"]."""
+    branches = []
+    start = depth = 0
+    in_class = False
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == '\\':
+            i += 1
+        elif in_class:
+            in_class = char != ']'
+        elif char == '[':
+            in_class = True
+            # "]" logo após "[" ou "[^" é literal
+            if pattern[i + 1:i + 2] == '^':
+                i += 1
+            if pattern[i + 1:i + 2] == ']':
+                i += 1
+        elif char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif char == '|' and depth == 0:
+            branches.append(pattern[start:i])
+            start = i + 1
+        i += 1
+    branches.append(pattern[start:])
+    return branches
+
+# Flags globais no início de um padrão, ex: "(?i)readme"
+_GLOBAL_FLAGS_RE = re.compile(r'\(\?([aiLmsux]+)\)')
+
+def _scope_inline_flags(pattern: str) -> str:
+    """Converte flags globais iniciais em um grupo com escopo: "(?i)foo" -> "(?i:foo)"."""
+    flags = ''
+    match = _GLOBAL_FLAGS_RE.match(pattern)
+    while match:
+        flags += match.group(1)
+        pattern = pattern[match.end():]
+        match = _GLOBAL_FLAGS_RE.match(pattern)
+    
+    if not flags:
+        return pattern
+    # Em modo verbose um comentário (#) iria "engolir" o parêntese de fechamento
+    end = '\n)' if 'x' in flags else ')'
+    return f'(?{flags}:{pattern}{end}'
 
 class RepoToMarkdown:
-    def __init__(self, ignore_patterns: List[str] = None):
+    def __init__(self, ignore_patterns: List[str] = None, max_bytes: Optional[int] = 1 << 20):
         self.ignore_patterns = ignore_patterns or []
+        if max_bytes is not None and max_bytes < 0:
+            raise ValueError(f"max_bytes deve ser >= 0: {max_bytes}")
+        # Tamanho máximo (em bytes) de um arquivo incluído; None ou 0 desativa o limite
+        self.max_bytes = max_bytes or None
+        # Extensões de código suportadas (somente leitura)
+        self.code_extensions = types.MappingProxyType(CODE_EXTENSIONS)
         
         # Padrões padrão para ignorar
         self.default_ignore = [
@@ -48,190 +196,216 @@ class RepoToMarkdown:
             r'\.next/.*',
             r'\.nuxt/.*'
         ]
+
+        # Compila os padrões sem grupos de captura em uma única expressão regular
+        all_patterns = [_scope_inline_flags(p) for p in self.default_ignore + self.ignore_patterns]
+        plain_patterns = []
+        self._grouped_ignore = []
+        for pattern, scoped in zip(self.default_ignore + self.ignore_patterns, all_patterns):
+            compiled = re.compile(pattern)
+            if compiled.groups:
+                self._grouped_ignore.append(compiled)
+            else:
+                plain_patterns.append(scoped)
+        self._ignore_re = re.compile('(?:' + ')|(?:'.join(plain_patterns) + ')') if plain_patterns else None
         
-        # Extensões de código suportadas
-        self.code_extensions = {
-            '.py': 'python',
-            '.js': 'javascript',
-            '.ts': 'typescript',
-            '.jsx': 'jsx',
-            '.tsx': 'tsx',
-            '.java': 'java',
-            '.c': 'c',
-            '.cpp': 'cpp',
-            '.cc': 'cpp',
-            '.cxx': 'cpp',
-            '.h': 'c',
-            '.hpp': 'cpp',
-            '.cs': 'csharp',
-            '.php': 'php',
-            '.rb': 'ruby',
-            '.go': 'go',
-            '.rs': 'rust',
-            '.swift': 'swift',
-            '.kt': 'kotlin',
-            '.scala': 'scala',
-            '.sh': 'bash',
-            '.bash': 'bash',
-            '.zsh': 'zsh',
-            '.fish': 'fish',
-            '.ps1': 'powershell',
-            '.html': 'html',
-            '.htm': 'html',
-            '.css': 'css',
-            '.scss': 'scss',
-            '.sass': 'sass',
-            '.less': 'less',
-            '.xml': 'xml',
-            '.json': 'json',
-            '.yaml': 'yaml',
-            '.yml': 'yaml',
-            '.toml': 'toml',
-            '.ini': 'ini',
-            '.cfg': 'ini',
-            '.conf': 'ini',
-            '.sql': 'sql',
-            '.r': 'r',
-            '.R': 'r',
-            '.m': 'matlab',
-            '.pl': 'perl',
-            '.lua': 'lua',
-            '.vim': 'vim',
-            '.dockerfile': 'dockerfile',
-            '.Dockerfile': 'dockerfile',
-            '.md': 'markdown',
-            '.markdown': 'markdown',
-            '.tex': 'latex',
-            '.vue': 'vue',
-            '.svelte': 'svelte',
-            '.dart': 'dart',
-            '.elm': 'elm',
-            '.ex': 'elixir',
-            '.exs': 'elixir',
-            '.erl': 'erlang',
-            '.hrl': 'erlang',
-            '.clj': 'clojure',
-            '.cljs': 'clojure',
-            '.hs': 'haskell',
-            '.lhs': 'haskell',
-            '.ml': 'ocaml',
-            '.mli': 'ocaml',
-            '.fs': 'fsharp',
-            '.fsx': 'fsharp',
-            '.jl': 'julia',
-            '.nim': 'nim',
-            '.nims': 'nim',
-            '.cr': 'crystal',
-            '.zig': 'zig',
-            '.v': 'v',
-            '.sv': 'systemverilog',
-            '.vhd': 'vhdl',
-            '.vhdl': 'vhdl'
-        }
+        # Alternativas que são nomes literais de diretório podem podar a varredura
+        dir_patterns = [
+            branch
+            for p in all_patterns
+            for branch in _split_alternatives(p)
+            if _DIR_PATTERN_RE.fullmatch(branch)
+        ]
+        self._dir_ignore_re = re.compile('(?:' + ')|(?:'.join(dir_patterns) + ')') if dir_patterns else None
     
     def should_ignore(self, file_path: str) -> bool:
         """Verifica se um arquivo deve ser ignorado baseado nos padrões regex."""
-        all_patterns = self.default_ignore + self.ignore_patterns
-        
-        for pattern in all_patterns:
-            if re.search(pattern, file_path):
-                return True
-        return False
+        if self._ignore_re is not None and self._ignore_re.search(file_path):
+            return True
+        return any(regex.search(file_path) for regex in self._grouped_ignore)
+    
+    def should_ignore_dir(self, name: str) -> bool:
+        """Verifica se um diretório (pelo nome base) deve ser podado da varredura."""
+        if self._dir_ignore_re is None:
+            return False
+        return self._dir_ignore_re.search(name + '/') is not None
+    
+    @staticmethod
+    def get_extension(name: str) -> str:
+        """Retorna a extensão (em minúsculas) de um nome de arquivo, sem usar Path."""
+        dot = name.rfind('.')
+        # dot == 0: arquivos ocultos sem extensão (ex: .bashrc) não têm sufixo
+        return name[dot:].lower() if dot > 0 else ''
     
     def get_language_from_extension(self, file_path: str) -> str:
         """Retorna a linguagem baseada na extensão do arquivo."""
-        ext = Path(file_path).suffix.lower()
-        return self.code_extensions.get(ext, 'text')
+        ext = self.get_extension(os.path.basename(file_path))
+        return CODE_EXTENSIONS.get(ext, 'text')
     
-    def is_code_file(self, file_path: str) -> bool:
-        """Verifica se o arquivo é um arquivo de código suportado."""
-        ext = Path(file_path).suffix.lower()
-        return ext in self.code_extensions
+    def is_code_file(self, name: str) -> bool:
+        """Verifica se o arquivo (pelo nome base) é um arquivo de código suportado."""
+        return self.get_extension(name) in _CODE_EXTS
     
     def get_file_content(self, file_path: str) -> str:
         """Lê o conteúdo de um arquivo com tratamento de encoding."""
-        encodings = ['utf-8', 'latin-1', 'cp1252', 'iso-8859-1']
+        # Lê os bytes uma única vez e tenta decodificar em memória
+        try:
+            with open(file_path, 'rb') as f:
+                data = f.read()
+        except Exception as e:
+            print(f"Erro ao ler {file_path}: {e}")
+            return f"# Erro ao ler arquivo: {e}"
+        
+        # Byte nulo no início indica arquivo binário com extensão de código
+        if b'\x00' in data[:8192]:
+            return "# Arquivo binário ignorado"
         
-        for encoding in encodings:
+        # latin-1 decodifica qualquer sequência de bytes, então a cadeia sempre termina
+        for encoding in ('utf-8', 'latin-1', 'cp1252', 'iso-8859-1'):
             try:
-                with open(file_path, 'r', encoding=encoding) as f:
-                    return f.read()
+                content = data.decode(encoding)
             except UnicodeDecodeError:
                 continue
-            except Exception as e:
-                print(f"Erro ao ler {file_path}: {e}")
-                return f"# Erro ao ler arquivo: {e}"
+            # Mantém a normalização de quebras de linha do modo texto
+            return content.replace('\r\n', '\n').replace('\r', '\n')
+    
+    @staticmethod
+    def _sorted_entries(path: str) -> Iterator[os.DirEntry]:
+        """Lista as entradas de um diretório em ordem determinística (diretórios primeiro, depois por nome)."""
+        # Como o os.walk, diretórios ilegíveis são simplesmente pulados
+        try:
+            with os.scandir(path) as it:
+                return iter(sorted(it, key=lambda e: (not e.is_dir(follow_symlinks=False), e.name)))
+        except OSError:
+            return iter(())
+    
+    def scan_directory(self, directory: str) -> Iterator[Tuple[str, str, str]]:
+        """Escaneia o diretório e gera (arquivo, caminho relativo, linguagem) dos arquivos de código."""
+        # Com a raiz absoluta, o caminho relativo é só um fatiamento (evita os.path.relpath)
+        root = os.path.abspath(directory)
+        prefix_len = len(os.path.join(root, ''))
+        # Pilha de iteradores: percorre em profundidade mantendo a ordem de cada nível
+        stack = [self._sorted_entries(root)]
         
-        return "# Arquivo não pôde ser decodificado"
+        # Atributos e métodos resolvidos uma vez fora do laço
+        sorted_entries = self._sorted_entries
+        should_ignore_dir = self.should_ignore_dir
+        should_ignore = self.should_ignore
+        get_extension = self.get_extension
+        get_language = CODE_EXTENSIONS.get
+        max_bytes = self.max_bytes
+        push = stack.append
+
+        while stack:
+            for entry in stack[-1]:
+                if entry.is_dir(follow_symlinks=False):
+                    # Diretórios ignorados nem chegam a ser empilhados
+                    if not should_ignore_dir(entry.name):
+                        push(sorted_entries(entry.path))
+                        break
+                elif entry.is_file():  # links para arquivos entram, como no os.walk
+                    # Filtro barato (extensão) antes das regex de ignore
+                    language = get_language(get_extension(entry.name))
+                    if language is None:
+                        continue
+                    path = entry.path
+                    relative_path = path[prefix_len:]
+                    if should_ignore(relative_path):
+                        continue
+                    # stat do DirEntry reaproveita os metadados da listagem quando possível
+                    if max_bytes is not None:
+                        try:
+                            size = entry.stat().st_size
+                        except OSError as e:
+                            # Ex: arquivo removido durante a varredura
+                            print(f"Erro ao ler {relative_path}: {e}")
+                            continue
+                        if size > max_bytes:
+                            print(f"Ignorando {relative_path}: {size:,} bytes excede o limite de {max_bytes:,}")
+                            continue
+                    yield path, relative_path, language
+            else:
+                stack.pop()
     
-    def scan_directory(self, directory: str) -> List[str]:
-        """Escaneia o diretório e retorna lista de arquivos de código."""
-        code_files = []
+    def read_files(self, code_files: Iterable[Tuple[str, str, str]],
+                   max_workers: int = 32) -> Iterator[Tuple[Tuple[str, str, str], str]]:
+        """Lê os arquivos em paralelo e gera (arquivo, conteúdo) na ordem de entrada."""
+        # Janela limitada de leituras pendentes: memória constante independente do total de arquivos
+        window = 2 * max_workers
+        pending = deque()
         
-        for root, dirs, files in os.walk(directory):
-            # Remove diretórios que devem ser ignorados
-            dirs[:] = [d for d in dirs if not self.should_ignore(os.path.join(root, d))]
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for item in code_files:
+                pending.append((item, executor.submit(self.get_file_content, item[0])))
+                if len(pending) >= window:
+                    item, future = pending.popleft()
+                    yield item, future.result()
             
-            for file in files:
-                file_path = os.path.join(root, file)
-                relative_path = os.path.relpath(file_path, directory)
-                
-                if not self.should_ignore(relative_path) and self.is_code_file(file_path):
-                    code_files.append(file_path)
-        
-        return sorted(code_files)
+            while pending:
+                item, future = pending.popleft()
+                yield item, future.result()
     
     def generate_markdown(self, directory: str, output_file: str):
         """Gera o arquivo Markdown com todo o código do repositório."""
         print(f"Escaneando diretório: {directory}")
-        code_files = self.scan_directory(directory)
-        
-        if not code_files:
-            print("Nenhum arquivo de código encontrado!")
-            return
         
-        print(f"Encontrados {len(code_files)} arquivos de código")
+        # Índice em memória; conteúdo em um temporário ao lado da saída, copiado após o índice
+        index_buf = io.StringIO()
+        total = 0
         
-        # Gera o conteúdo Markdown
-        with open(output_file, 'w', encoding='utf-8') as f:
-            # Cabeçalho
-            repo_name = os.path.basename(os.path.abspath(directory))
-            f.write(f"# Código Fonte - {repo_name}\n\n")
-            f.write(f"Este documento contém todo o código fonte do repositório `{repo_name}`.\n\n")
-            f.write(f"**Total de arquivos:** {len(code_files)}\n\n")
-            
-            # Índice
-            f.write("## Índice\n\n")
-            for file_path in code_files:
-                relative_path = os.path.relpath(file_path, directory)
-                anchor = relative_path.replace('/', '-').replace('.', '-').replace('_', '-').lower()
-                f.write(f"- [{relative_path}](#{anchor})\n")
-            f.write("\n---\n\n")
-            
-            # Conteúdo dos arquivos
-            for i, file_path in enumerate(code_files, 1):
-                relative_path = os.path.relpath(file_path, directory)
-                language = self.get_language_from_extension(file_path)
+        with tempfile.TemporaryFile(dir=os.path.dirname(os.path.abspath(output_file))) as body:
+            for (_, relative_path, language), content in self.read_files(self.scan_directory(directory)):
+                total += 1
+                # Progresso em lotes: evita um flush no terminal por arquivo
+                if total % 100 == 0:
+                    print(f"Processando ({total}): {relative_path}")
                 
-                print(f"Processando ({i}/{len(code_files)}): {relative_path}")
+                anchor = relative_path.translate(_ANCHOR_TABLE).lower()
+                index_buf.write(f"- [{relative_path}](#{anchor})\n")
                 
-                # Cabeçalho do arquivo
-                f.write(f"## {relative_path}\n\n")
-                f.write(f"**Caminho:** `{relative_path}`\n")
-                f.write(f"**Linguagem:** {language}\n\n")
+                # Cabeçalho e conteúdo do arquivo em uma única escrita
+                newline = '' if content.endswith('\n') else '\n'
+                body.write((
+                    f"## {relative_path}\n\n"
+                    f"**Caminho:** `{relative_path}`\n"
+                    f"**Linguagem:** {language}\n\n"
+                    f"```{language}\n{content}{newline}```\n\n"
+                    "---\n\n"
+                ).encode('utf-8'))
+            
+            if not total:
+                print("Nenhum arquivo de código encontrado!")
+                return
+            
+            print(f"Encontrados {total} arquivos de código")
+            
+            # Gera o conteúdo Markdown
+            with open(output_file, 'wb', buffering=1 << 20) as f:
+                # Cabeçalho e índice
+                repo_name = os.path.basename(os.path.abspath(directory))
+                f.write((
+                    f"# Código Fonte - {repo_name}\n\n"
+                    f"Este documento contém todo o código fonte do repositório `{repo_name}`.\n\n"
+                    f"**Total de arquivos:** {total}\n\n"
+                    "## Índice\n\n"
+                    f"{index_buf.getvalue()}"
+                    "\n---\n\n"
+                ).encode('utf-8'))
                 
-                # Conteúdo do arquivo
-                content = self.get_file_content(file_path)
-                f.write(f"```{language}\n")
-                f.write(content)
-                if not content.endswith('\n'):
-                    f.write('\n')
-                f.write("```\n\n")
-                f.write("---\n\n")
+                # Conteúdo dos arquivos
+                body.seek(0)
+                shutil.copyfileobj(body, f, 1 << 20)
         
         print(f"Arquivo Markdown gerado: {output_file}")
         print(f"Tamanho do arquivo: {os.path.getsize(output_file):,} bytes")
 
+def non_negative_int(value: str) -> int:
+    """Tipo do argparse para inteiros maiores ou iguais a zero."""
+    number = int(value)
+    if number < 0:
+        raise argparse.ArgumentTypeError(f"valor deve ser >= 0: {value}")
+    return number
+
 def main():
     parser = argparse.ArgumentParser(
         description="Converte todo o código fonte de um repositório para um arquivo Markdown único",
@@ -261,6 +435,13 @@ Exemplos:
         help='Padrão regex para ignorar arquivos (pode ser usado múltiplas vezes)'
     )
     
+    parser.add_argument(
+        '-s', '--max-bytes',
+        type=non_negative_int,
+        default=1 << 20,
+        help='Tamanho máximo de cada arquivo em bytes (0 desativa o limite, padrão: 1048576)'
+    )
+    
     args = parser.parse_args()
     
     # Valida o diretório
@@ -274,17 +455,12 @@ Exemplos:
     
     # Cria o diretório de saída se não existir
     output_dir = os.path.dirname(args.output)
-    if output_dir and not os.path.exists(output_dir):
-        os.makedirs(output_dir)
-    
-    ignore_patterns = []
-    if args.exclude:
-        for pattern in args.exclude:
-            ignore_patterns.extend(pattern.split('|'))
-    
-    converter = RepoToMarkdown(ignore_patterns)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
     
     try:
+        # A alternância "|" é tratada pela própria regex compilada (ex: "(foo|bar)\.py")
+        converter = RepoToMarkdown(args.exclude or [], args.max_bytes)
         converter.generate_markdown(args.directory, args.output)
         print("Conversão concluída com sucesso!")
         return 0